@@ -1,4 +1,57 @@
+import os
+import numpy as np
 import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
+from dados import aplicar_esquema, salvar_instantaneo
+from exportacao import gravar_excel
+
+CAMINHO_SAIDA = "planilha/controledosistema.xlsx"
+
+
+# Junção externa pelas colunas-chave feita sobre um único inteiro por linha.
+# Cada coluna-chave é fatorada uma vez (tabela hash) sobre as duas planilhas,
+# com os códigos em ordem crescente e os vazios por último, e os códigos são
+# combinados em uma chave composta. Como a ordem da chave composta é a mesma
+# ordem lexicográfica das colunas, o resultado sai igual ao do pd.merge(...,
+# how="outer") nas três colunas: mesmas linhas, na mesma ordem e com as mesmas
+# colunas.
+def mesclar_por_chave(esquerda, direita, colunas, sufixos=('_x', '_y')):
+    chaves = pd.concat([esquerda[colunas], direita[colunas]], ignore_index=True)
+    codigo = np.zeros(len(chaves), dtype=np.int64)
+    for coluna in colunas:
+        codigos, unicos = pd.factorize(chaves[coluna], sort=True)
+        codigos = np.where(codigos < 0, len(unicos), codigos)
+        # Refatorar mantém a ordem e a chave composta pequena (sem estouro)
+        codigo, _ = pd.factorize(codigo * (len(unicos) + 1) + codigos, sort=True)
+
+    chave = '__chave'
+    mesclada = pd.merge(
+        esquerda.drop(columns=colunas).assign(**{chave: codigo[:len(esquerda)]}),
+        direita.drop(columns=colunas).assign(**{chave: codigo[len(esquerda):]}),
+        on=chave, how='outer', suffixes=sufixos,
+    )
+
+    # Volta com as colunas-chave, nas posições da planilha da esquerda,
+    # tirando os valores da primeira linha que tem cada código
+    _, primeira = np.unique(codigo, return_index=True)
+    linhas = primeira[mesclada[chave].to_numpy()]
+    # Com um dos lados vazio, as chaves ficam com o tipo do outro, como no pd.merge
+    if len(esquerda) == 0 or len(direita) == 0:
+        chaves = (direita if len(esquerda) == 0 else esquerda)[colunas].reset_index(drop=True)
+    for coluna in sorted(colunas, key=esquerda.columns.get_loc):
+        mesclada.insert(esquerda.columns.get_loc(coluna), coluna, chaves[coluna].take(linhas).to_numpy())
+    return mesclada.drop(columns=chave)
+
+
+# Textos que o read_excel lê como vazios (o 'nan' deixado pelo astype(str),
+# 'NA', 'NULL'...) viram vazio, para o instantâneo ter os mesmos dados que o
+# sistema teria lendo o xlsx gravado
+def como_lido_do_excel(df):
+    df = df.copy()
+    for coluna in df.columns[df.dtypes == object]:
+        df[coluna] = df[coluna].mask(df[coluna].isin(STR_NA_VALUES))
+    return df
+
 
 # Carregar as duas planilhas em DataFrames
 planilha1 = pd.read_excel("planilha/PEDIDOS_VOLPE8.XLSX", sheet_name="Planilha1")
@@ -8,19 +61,27 @@ planilha2 = pd.read_excel("planilha/ABASTECIDOS.XLSX", sheet_name="Planilha2")
 planilha1['Ped. Cliente'] = planilha1['Ped. Cliente'].astype(str)
 planilha2['Ped. Cliente'] = planilha2['Ped. Cliente'].astype(str)
 
-# Filtrar linhas em planilha1 com Nr.pedido contendo hífen (-)
-planilha1_com_hifen = planilha1[planilha1['Nr.pedido'].str.contains('-')]
-planilha1_sem_hifen = planilha1[~planilha1['Nr.pedido'].str.contains('-')]
+# Separar as linhas de planilha1 com Nr.pedido contendo hífen (-), em uma só passada
+com_hifen = planilha1['Nr.pedido'].str.contains('-', regex=False)
+planilha1_com_hifen = planilha1[com_hifen]
+planilha1_sem_hifen = planilha1[~com_hifen]
 
 # Mesclar planilha1_com_hifen com planilha2 com base em colunas comuns
 colunas_comuns = ["Ped. Cliente", "Modelo", "Produto"]  # Nomes das colunas que são iguais em ambas as planilhas
-planilha_mesclada_com_hifen = pd.merge(planilha1_com_hifen, planilha2, on=colunas_comuns, how="outer", suffixes=('_planilha1', '_planilha2'))
+planilha_mesclada_com_hifen = mesclar_por_chave(planilha1_com_hifen, planilha2, colunas_comuns, sufixos=('_planilha1', '_planilha2'))
 
 # Concatenar planilha_mesclada_com_hifen com planilha1_sem_hifen
 planilha_mesclada = pd.concat([planilha_mesclada_com_hifen, planilha1_sem_hifen]).reset_index(drop=True)
 
-# Salvar a planilha mesclada em formato Excel
-with pd.ExcelWriter("planilha/controledosistema.xlsx", engine='openpyxl', mode='w') as writer:
-    planilha_mesclada.to_excel(writer, index=False, sheet_name='Planilha1')
+# Salvar a planilha mesclada em formato Excel (xlsxwriter, linha a linha). O
+# arquivo é gravado ao lado e trocado de uma vez, para o sistema nunca ler uma
+# planilha pela metade.
+temporario = f"{CAMINHO_SAIDA}.{os.getpid()}.tmp"
+gravar_excel(planilha_mesclada, temporario, aba='Planilha1')
+os.replace(temporario, CAMINHO_SAIDA)
+
+# Gravar também o instantâneo colunar da planilha nova, com a assinatura do
+# xlsx recém-gravado: o sistema carrega direto dele, sem ler o Excel de novo
+salvar_instantaneo(aplicar_esquema(como_lido_do_excel(planilha_mesclada)), CAMINHO_SAIDA)
 
-print("Planilha mesclada criada com sucesso.")
\ No newline at end of file
+print("Planilha mesclada criada com sucesso.")
@@ -1,10 +1,12 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from exclusoes import carregar_exclusoes, mascara_excluidos
 
 # Função para carregar os dados
 @st.cache_data
-def carregar_dados(caminho):
+def carregar_dados(caminho, exclusoes):
     dados = pd.read_excel(caminho, usecols=[
         'Ped. Cliente', 'Dt.pedido', 'Fantasia', 'Produto', 'Modelo', 
         'Qtd.', 'Valor Unit.', 'Valor Total', 'Qtd.a produzir', 
@@ -16,59 +18,80 @@ def carregar_dados(caminho):
     # Remover linhas onde 'Nr.pedido' está vazio ou NaN
     dados = dados[dados['Nr.pedido'].notna() & (dados['Nr.pedido'] != '')]
     
-    # Remover linhas onde 'Ped. Cliente' seja igual a 'TUMELERO'
-    dados = dados[dados['Ped. Cliente'] != 'TUMELERO']
+    # Remover os pedidos internos listados em planilha/clientes_excluidos.txt
+    dados = dados[~mascara_excluidos(dados['Ped. Cliente'], exclusoes)]
     
     return dados
 
-# Função para classificar setores automaticamente
-def classificar_setor_automatico(pedido, pedidos_df):
-    pedido_id = str(pedido['Nr.pedido']).split('-')[0]  # Extrai a parte do pedido sem sufixo
-    possui_sufixo = '-' in str(pedido['Nr.pedido'])  # Verifica se o pedido tem sufixo
-
-    # Se "Qtd. Produzida" for preenchida, vai para Expedição
-    if pd.notnull(pedido['Qtd. Produzida']) and pedido['Qtd. Produzida'] > 0:
-        return "Expedição"
-
-    if possui_sufixo:  # Pedido com sufixo
-        # Se "Qtd. a produzir" estiver vazia, vai para "Sem O.E."
-        if pd.isnull(pedido['Qtd.a produzir']) or pedido['Qtd.a produzir'] == 0:
-            return "Sem O.E."
-        # Caso contrário, pode ir para Produção ou Compras
-        if pedido['Qtd.a liberar'] > 0:
-            return "Embalagem"
-        else:
-            return "Compras"
-    
-    else:  # Pedido sem sufixo
-        # Verifica se existe algum pedido com o mesmo número sem sufixo, mas com sufixo (ex: "1234" e "1234-1")
-        if (pedidos_df['Nr.pedido'].str.startswith(pedido_id) & pedidos_df['Nr.pedido'].str.contains('-')).any():
-            return "Expedição"  # Pedido sem sufixo vai para Expedição se houver um pedido com sufixo
-        else:
-            return "Separação"  # Caso contrário, vai para Separação
-
-# Função para identificar e criar novos pedidos com base na diferença de Qtd.a produzir e Qtd.a liberar
+# Função para classificar setores automaticamente, para todos os pedidos de uma vez.
+# A verificação "existe algum pedido com sufixo que comece com o mesmo número"
+# usa busca binária em um índice ordenado dos pedidos com sufixo, em vez de
+# varrer a coluna inteira para cada linha.
+def classificar_setores(pedidos_df):
+    # Cada número de pedido distinto é analisado uma única vez
+    codigos, numeros = pd.factorize(pedidos_df['Nr.pedido'], use_na_sentinel=False)
+    numeros = pd.Series(numeros, dtype=object)
+    texto = numeros.astype(str).to_numpy(dtype=str)
+    pedido_id = np.char.partition(texto, '-')[:, 0]  # Extrai a parte do pedido sem sufixo
+    possui_sufixo = np.char.find(texto, '-') >= 0  # Verifica se o pedido tem sufixo
+
+    # Índice: números de pedido (texto) que têm sufixo, em ordem
+    indice = np.sort(texto[numeros.str.contains('-', regex=False).eq(True).to_numpy()])
+
+    # Pedidos com o mesmo prefixo ficam juntos no índice: basta olhar a posição
+    # onde o número sem sufixo entraria
+    tem_pedido_com_sufixo = np.zeros(len(texto), dtype=bool)
+    if len(indice):
+        posicao = np.searchsorted(indice, pedido_id)
+        candidato = indice[np.minimum(posicao, len(indice) - 1)]
+        tem_pedido_com_sufixo = (posicao < len(indice)) & np.char.startswith(candidato, pedido_id)
+
+    possui_sufixo = possui_sufixo[codigos]
+    tem_pedido_com_sufixo = tem_pedido_com_sufixo[codigos]
+
+    produzida = pedidos_df['Qtd. Produzida']
+    a_produzir = pedidos_df['Qtd.a produzir']
+    liberar = pedidos_df['Qtd.a liberar']
+
+    setor = np.select(
+        [
+            # Se "Qtd. Produzida" for preenchida, vai para Expedição
+            (produzida > 0).to_numpy(),
+            # Pedido com sufixo sem "Qtd. a produzir" vai para "Sem O.E."
+            possui_sufixo & (a_produzir.isna() | (a_produzir == 0)).to_numpy(),
+            # Caso contrário, pode ir para Embalagem ou Compras
+            possui_sufixo & (liberar > 0).to_numpy(),
+            possui_sufixo,
+            # Pedido sem sufixo vai para Expedição se houver um pedido com sufixo
+            tem_pedido_com_sufixo,
+        ],
+        ['Expedição', 'Sem O.E.', 'Embalagem', 'Compras', 'Expedição'],
+        default='Separação',
+    )
+    return pd.Series(setor, index=pedidos_df.index, dtype=object)
+
+# Função para identificar e criar novos pedidos com base na diferença de Qtd.a produzir e Qtd.a liberar.
+# Todas as linhas com diferença são tratadas de uma vez, com uma única máscara.
 def criar_novos_pedidos_com_diferenca(df):
-    novos_pedidos = []  # Lista para armazenar os novos pedidos
-    for index, pedido in df.iterrows():
-        # Verifica se a quantidade a produzir é maior que a quantidade a liberar
-        if pd.notnull(pedido['Qtd.a produzir']) and pd.notnull(pedido['Qtd.a liberar']):
-            if pedido['Qtd.a produzir'] > pedido['Qtd.a liberar']:
-                quantidade_diferenca = pedido['Qtd.a produzir'] - pedido['Qtd.a liberar']
-                
-                # Cria uma nova linha com a quantidade de diferença e manda para Compras
-                novo_pedido = pedido.copy()  # Copia o pedido original
-                novo_pedido['Qtd.'] = quantidade_diferenca  # Ajusta a quantidade para a nova linha
-                novo_pedido['Qtd.a produzir'] = quantidade_diferenca  # Preenche a quantidade a produzir com o valor da diferença
-                novo_pedido['Setor'] = 'Compras'  # Coloca na guia de Compras
-                novos_pedidos.append(novo_pedido)  # Adiciona à lista de novos pedidos
-
-                # Atualiza a linha original para Expedição
-                df.at[index, 'Qtd.'] = pedido['Qtd.a liberar']  # Ajusta a quantidade original
-                df.at[index, 'Setor'] = 'Expedição'  # Coloca na guia de Expedição
+    # Verifica se a quantidade a produzir é maior que a quantidade a liberar
+    com_diferenca = df['Qtd.a produzir'].notna() & df['Qtd.a liberar'].notna() & (df['Qtd.a produzir'] > df['Qtd.a liberar'])
+    if not com_diferenca.any():
+        return df.reset_index(drop=True)
+
+    quantidade_diferenca = (df['Qtd.a produzir'] - df['Qtd.a liberar'])[com_diferenca]
+
+    # Cria as novas linhas com a quantidade de diferença e manda para Compras
+    novos_pedidos = df[com_diferenca].copy()
+    novos_pedidos['Qtd.'] = quantidade_diferenca  # Ajusta a quantidade para a nova linha
+    novos_pedidos['Qtd.a produzir'] = quantidade_diferenca  # Preenche a quantidade a produzir com o valor da diferença
+    novos_pedidos['Setor'] = 'Compras'  # Coloca na guia de Compras
+
+    # Atualiza as linhas originais para Expedição
+    df.loc[com_diferenca, 'Qtd.'] = df.loc[com_diferenca, 'Qtd.a liberar']  # Ajusta a quantidade original
+    df.loc[com_diferenca, 'Setor'] = 'Expedição'  # Coloca na guia de Expedição
 
     # Concatena os novos pedidos com o DataFrame original
-    return pd.concat([df, pd.DataFrame(novos_pedidos)], ignore_index=True)
+    return pd.concat([df, novos_pedidos], ignore_index=True)
 
 # Função para definir a data e o status
 def definir_data_e_status(dataframe):
@@ -86,13 +109,13 @@ def definir_data_e_status(dataframe):
 
 # Carregar os dados
 caminho_planilha = "planilha/controledosistema2.xlsx"
-df = carregar_dados(caminho_planilha)
+df = carregar_dados(caminho_planilha, carregar_exclusoes())
 
 # Identificar e criar novos pedidos para a diferença de quantidade
 df = criar_novos_pedidos_com_diferenca(df)
 
 # Classificar setores
-df['Setor'] = df.apply(lambda pedido: classificar_setor_automatico(pedido, df), axis=1)
+df['Setor'] = classificar_setores(df)
 
 # Aplicar a função para definir o Status
 df = definir_data_e_status(df)
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+
+
+# Cache LRU compartilhado por todas as sessões (filtros, páginas da tabela,
+# figuras, arquivos exportados). É limitado pelo número de entradas e, quando
+# há medir(), pelo total em bytes dos valores guardados; ao passar de qualquer
+# um dos dois, os valores usados há mais tempo saem.
+class CacheLRU:
+    def __init__(self, max_entradas=512, max_bytes=None, medir=None):
+        self.max_bytes = float('inf') if max_bytes is None else max_bytes
+        self.max_entradas = max_entradas
+        self.medir = medir or (lambda valor: 0)
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    # Devolve o resultado guardado para a chave, ou None, sem calcular nada
+    def procurar(self, chave):
+        with self._lock:
+            resultado = self._entradas.get(chave)
+            if resultado is not None:
+                self._entradas.move_to_end(chave)
+            return resultado
+
+    # Devolve o resultado guardado para a chave ou o calcula com calcular()
+    def obter(self, chave, calcular):
+        with self._lock:
+            resultado = self._entradas.get(chave)
+            if resultado is not None:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return resultado
+            self.falhas += 1
+
+        # O cálculo fica fora da trava para não segurar as outras sessões
+        resultado = calcular()
+        with self._lock:
+            if chave not in self._entradas:
+                self._entradas[chave] = resultado
+                self._bytes += self.medir(resultado)
+                self._descartar()
+        return resultado
+
+    # Guarda o valor já calculado para a chave, sem contar acerto nem falha
+    def guardar(self, chave, valor):
+        with self._lock:
+            if chave in self._entradas:
+                self._bytes -= self.medir(self._entradas.pop(chave))
+            self._entradas[chave] = valor
+            self._bytes += self.medir(valor)
+            self._descartar()
+
+    # Remove os mais antigos até caber nos limites; chamar com a trava
+    def _descartar(self):
+        while len(self._entradas) > 1 and (
+            self._bytes > self.max_bytes or len(self._entradas) > self.max_entradas
+        ):
+            _, antigo = self._entradas.popitem(last=False)
+            self._bytes -= self.medir(antigo)
+            self.descartes += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'entradas': len(self._entradas),
+                'MB': self._bytes / 2**20,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'descartes': self.descartes,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
@@ -0,0 +1,279 @@
+import os
+import json
+import zlib
+import logging
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# Com o Copy-on-Write, qualquer alteração feita por uma sessão em um DataFrame
+# derivado gera uma cópia própria e nunca escreve nos dados compartilhados.
+pd.set_option('mode.copy_on_write', True)
+
+# Uma trava por planilha, para que leituras simultâneas do Excel não se repitam
+_travas = {}
+_travas_lock = threading.Lock()
+
+
+def _trava(caminho):
+    with _travas_lock:
+        return _travas.setdefault(os.path.abspath(caminho), threading.Lock())
+
+# Chave gravada nos metadados do Parquet para saber de qual planilha ele veio
+CHAVE_METADADOS = b'origem_planilha'
+
+
+# Identifica a versão da planilha pelo caminho, tamanho e data de modificação
+def assinatura_arquivo(caminho):
+    info = os.stat(caminho)
+    return {
+        'caminho': os.path.abspath(caminho),
+        'tamanho': info.st_size,
+        'mtime_ns': info.st_mtime_ns,
+        # Mudar o ESQUEMA invalida os instantâneos gravados com o anterior
+        'esquema': zlib.crc32(repr(sorted(ESQUEMA.items())).encode()),
+    }
+
+
+# Os instantâneos ficam em uma pasta "cache" ao lado da planilha
+def caminho_instantaneo(caminho):
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    return os.path.join(os.path.dirname(caminho) or '.', 'cache', f'{nome}.parquet')
+
+
+# Tipos das colunas da carteira. Textos com poucos valores distintos viram
+# categorias; quantidades, inteiros compactos que aceitam vazio; o número do
+# pedido é texto que aceita vazio (sem o 'nan' de antes). Valores com frações
+# (dinheiro e percentuais) ficam em float64 ('Valor Total' nem entra no
+# esquema): no float32, 3,19 vira 3,190000057... e 7,6 sai 7,599999904... nas
+# somas e nas exportações.
+ESQUEMA = {
+    'Nr.pedido': 'texto',
+    'Ped. Cliente': 'categoria',
+    'Dt.pedido': 'data',
+    'Dt.fat.': 'data',
+    'Prev.entrega': 'data',
+    'Emp': 'inteiro',
+    'Código': 'inteiro',
+    'Razão': 'categoria',
+    'Fantasia': 'categoria',
+    'UF': 'categoria',
+    'Tp.Venda': 'categoria',
+    'F.Pagto': 'categoria',
+    'Vendedor': 'categoria',
+    '% Comissão': 'decimal',
+    'Operador': 'categoria',
+    '% Comissão.1': 'decimal',
+    'Produto': 'categoria',
+    'Modelo': 'categoria',
+    'UN': 'categoria',
+    'Qtd.': 'inteiro',
+    '% ICMS': 'decimal',
+    '% IPI': 'decimal',
+    'Valor Unit.': 'decimal',
+    'Vl.Desc.': 'decimal',
+    'X': 'inteiro',
+    'Cód.': 'inteiro',
+    'OP': 'inteiro',
+    'Und': 'categoria',
+    'Qtd.a produzir': 'inteiro',
+    'Qtd. Produzida': 'inteiro',
+    'Qtd.a liberar': 'inteiro',
+    'Processo': 'categoria',
+    'Dt.abastecimento': 'data',
+    'Dt.Prev.Início': 'categoria',
+    'Dt.Prev.Entrega': 'data',
+    'Origem': 'categoria',
+    'Setor': 'categoria',
+    'Se iguais': 'categoria',
+}
+
+
+def _inteiro_compacto(coluna):
+    numeros = pd.to_numeric(coluna, errors='coerce')
+    valores = numeros.dropna()
+    # Colunas com frações (ex.: Qtd.a liberar em alguns pedidos) ficam em float64
+    if not (valores == np.round(valores)).all():
+        return numeros.astype('float64')
+    if valores.empty or valores.abs().max() < 2**31:
+        return numeros.astype('Int32')
+    return numeros.astype('Int64')
+
+
+# Converte as colunas conhecidas para os tipos do ESQUEMA; as demais ficam como vieram
+def aplicar_esquema(df, esquema=ESQUEMA):
+    df = df.copy()
+    for coluna, tipo in esquema.items():
+        if coluna not in df.columns:
+            continue
+        if tipo == 'categoria':
+            df[coluna] = df[coluna].astype('category')
+        elif tipo == 'texto':
+            df[coluna] = df[coluna].astype('string[pyarrow]')
+        elif tipo == 'inteiro':
+            df[coluna] = _inteiro_compacto(df[coluna])
+        elif tipo == 'decimal':
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').astype('float64')
+        elif tipo == 'data':
+            df[coluna] = pd.to_datetime(df[coluna], errors='coerce')
+    return df
+
+
+# Memória ocupada por coluna, em MB, antes e depois da conversão de tipos
+def relatorio_memoria(antes, depois):
+    relatorio = pd.DataFrame({
+        'tipo_antes': antes.dtypes.astype(str),
+        'MB_antes': antes.memory_usage(deep=True, index=False) / 2**20,
+        'tipo_depois': depois.dtypes.astype(str),
+        'MB_depois': depois.memory_usage(deep=True, index=False) / 2**20,
+    })
+    relatorio.loc['TOTAL', ['MB_antes', 'MB_depois']] = relatorio[['MB_antes', 'MB_depois']].sum()
+    return relatorio
+
+
+# Colunas do Excel que misturam datas e textos (ex.: "/  /") não cabem em um
+# tipo Arrow; essas são gravadas como texto, o que o pd.to_datetime já trata.
+def _normalizar_colunas_mistas(df):
+    df = df.copy()
+    for coluna in df.columns:
+        if df[coluna].dtype != object:
+            continue
+        valores = df[coluna].dropna()
+        if valores.map(type).nunique() > 1:
+            df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+    return df
+
+
+def _ler_instantaneo(arquivo, assinatura):
+    try:
+        metadados = pq.read_schema(arquivo).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if json.loads(metadados.get(CHAVE_METADADOS, b'{}')) != assinatura:
+        return None
+    df = pq.read_table(arquivo).to_pandas()
+    # O Arrow devolve None nos textos vazios; o read_excel devolve NaN
+    for coluna in df.columns[df.dtypes == object]:
+        df[coluna] = df[coluna].where(df[coluna].notna(), np.nan)
+    # O Parquet devolve os textos como string[python]; volta ao tipo do esquema
+    for coluna, tipo in ESQUEMA.items():
+        if tipo == 'texto' and coluna in df.columns:
+            df[coluna] = df[coluna].astype('string[pyarrow]')
+    return df
+
+
+# Grava o DataFrame como instantâneo da planilha informada
+def salvar_instantaneo(df, caminho, assinatura=None):
+    if assinatura is None:
+        assinatura = assinatura_arquivo(caminho)
+    arquivo = caminho_instantaneo(caminho)
+    tabela = pa.Table.from_pandas(_normalizar_colunas_mistas(df), preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados[CHAVE_METADADOS] = json.dumps(assinatura).encode()
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+    temporario = f'{arquivo}.{os.getpid()}.tmp'
+    pq.write_table(tabela, temporario)
+    os.replace(temporario, arquivo)
+    return arquivo
+
+
+# Carrega a planilha a partir do instantâneo colunar; o Excel só é lido de novo
+# quando o arquivo de origem muda de tamanho ou de data de modificação.
+def carregar_planilha(caminho):
+    # Quem chega enquanto outra thread converte a planilha espera e reaproveita
+    # o instantâneo recém-gravado, em vez de ler o Excel de novo
+    with _trava(caminho):
+        assinatura = assinatura_arquivo(caminho)
+        df = _ler_instantaneo(caminho_instantaneo(caminho), assinatura)
+        if df is not None:
+            return df
+
+        bruto = pd.read_excel(caminho)
+        df = _normalizar_colunas_mistas(aplicar_esquema(bruto))
+        logger.info(
+            '%s convertida: %.1f MB -> %.1f MB em memória', caminho,
+            bruto.memory_usage(deep=True).sum() / 2**20, df.memory_usage(deep=True).sum() / 2**20,
+        )
+        try:
+            salvar_instantaneo(df, caminho, assinatura)
+        except (OSError, pa.ArrowException):
+            # Sem permissão de escrita na pasta: segue com os dados do Excel
+            pass
+        return df
+
+
+# Mantém a planilha carregada em memória e a recarrega em segundo plano quando
+# o arquivo muda (ex.: depois de rodar o PLANILHAMSC.py). As sessões leem
+# sempre o conjunto atual; a troca é feita de uma vez só, sem travar a página.
+class FonteDados:
+    def __init__(self, caminho, intervalo=5.0):
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self._assinatura = assinatura_arquivo(caminho)
+        self._atual = (1, carregar_planilha(caminho))
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._observar, name=f'observador:{caminho}', daemon=True)
+        self._thread.start()
+
+    @property
+    def versao(self):
+        return self._atual[0]
+
+    # Versão e dados lidos juntos, para não misturar uma versão com a outra.
+    # Os dados vão em cópia rasa: as colunas são as mesmas em memória para
+    # todas as sessões, mas nenhuma delas altera o DataFrame original.
+    def atual(self):
+        versao, df = self._atual
+        return versao, df.copy(deep=False)
+
+    def parar(self):
+        self._parar.set()
+
+    def _observar(self):
+        pendente = None
+        while not self._parar.wait(self.intervalo):
+            try:
+                assinatura = assinatura_arquivo(self.caminho)
+            except OSError:
+                continue
+            if assinatura == self._assinatura:
+                pendente = None
+                continue
+            # Espera a assinatura ficar estável por um ciclo, para não ler a
+            # planilha no meio da gravação
+            if assinatura != pendente:
+                pendente = assinatura
+                continue
+            try:
+                df = carregar_planilha(self.caminho)
+            except Exception:
+                logger.exception('Falha ao recarregar %s', self.caminho)
+                continue
+            self._atual = (self._atual[0] + 1, df)
+            self._assinatura = assinatura
+            pendente = None
+            logger.info('%s recarregada (versão %d)', self.caminho, self._atual[0])
+
+
+# Uma única fonte por planilha para o processo inteiro do Streamlit; o
+# cache_resource garante que só uma sessão faça a carga inicial
+@st.cache_resource
+def obter_fonte(caminho):
+    return FonteDados(caminho)
+
+
+# Relatório de memória da planilha: python dados.py [caminho]
+if __name__ == '__main__':
+    import sys
+
+    caminho = sys.argv[1] if len(sys.argv) > 1 else 'planilha/controledosistema.xlsx'
+    bruto = pd.read_excel(caminho)
+    with pd.option_context('display.max_rows', None, 'display.width', 120):
+        print(relatorio_memoria(bruto, aplicar_esquema(bruto)).round(3))
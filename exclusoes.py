@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+ARQUIVO_EXCLUSOES = 'planilha/clientes_excluidos.txt'
+
+
+# Lê a lista de clientes excluídos: valores exatos e prefixos (terminados em *)
+def ler_exclusoes(caminho=ARQUIVO_EXCLUSOES):
+    exatos, prefixos = set(), set()
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            linha = linha.strip()
+            if not linha or linha.startswith('#'):
+                continue
+            if linha.endswith('*'):
+                prefixos.add(linha[:-1])
+            else:
+                exatos.add(linha)
+    return frozenset(exatos), tuple(sorted(prefixos))
+
+
+@st.cache_data
+def _ler_exclusoes_versao(caminho, mtime_ns):
+    return ler_exclusoes(caminho)
+
+
+# O arquivo só é lido de novo quando é alterado
+def carregar_exclusoes(caminho=ARQUIVO_EXCLUSOES):
+    if not os.path.exists(caminho):
+        return frozenset(), ()
+    return _ler_exclusoes_versao(caminho, os.stat(caminho).st_mtime_ns)
+
+
+# Marca as linhas cujo valor está na lista de exclusão. A regra é avaliada uma
+# vez por valor distinto (categoria) e depois espalhada pelas linhas via código.
+def mascara_excluidos(coluna, exclusoes):
+    exatos, prefixos = exclusoes
+    categorias = coluna if isinstance(coluna.dtype, pd.CategoricalDtype) else coluna.astype('category')
+    excluir = np.array(
+        [isinstance(valor, str) and (valor in exatos or valor.startswith(prefixos)) for valor in categorias.cat.categories],
+        dtype=bool,
+    )
+    # O código -1 (valor vazio) cai no False acrescentado no final
+    excluir = np.append(excluir, False)
+    return pd.Series(excluir[categorias.cat.codes.to_numpy()], index=coluna.index)
@@ -0,0 +1,330 @@
+import os
+import sys
+import gzip
+import queue
+import types
+import tempfile
+import threading
+import contextlib
+import multiprocessing
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+import xlsxwriter
+from cache import CacheLRU
+
+# Linhas convertidas e gravadas de cada vez; a memória da exportação fica
+# presa a um lote, qualquer que seja o tamanho do relatório
+TAMANHO_LOTE = 20_000
+
+# Formatos oferecidos: extensão do arquivo e tipo MIME
+FORMATOS = {
+    'Excel (.xlsx)': ('xlsx', "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'CSV (.csv)': ('csv', "text/csv"),
+    'CSV compactado (.csv.gz)': ('csv.gz', "application/gzip"),
+    'Parquet (.parquet)': ('parquet', "application/vnd.apache.parquet"),
+}
+
+
+# Lotes de linhas do DataFrame; progresso(fração) é chamado a cada lote gravado
+def _lotes(df, progresso=None, tamanho=TAMANHO_LOTE):
+    for inicio in range(0, len(df), tamanho):
+        yield df.iloc[inicio:inicio + tamanho]
+        if progresso is not None:
+            progresso(min(inicio + tamanho, len(df)) / len(df))
+
+
+# O xlsxwriter toma 1900-01-01 por "só hora" e grava 0, que volta do Excel
+# como time(0, 0); essas datas vão como data (serial 1 + hora), como no openpyxl
+def _escrever_data(planilha, linha, coluna, valor, formato=None):
+    if valor.date() != date(1900, 1, 1):
+        return None
+    serial = 1 + (valor - datetime(1900, 1, 1)).total_seconds() / 86400
+    return planilha.write_number(linha, coluna, serial, formato or planilha.default_date_format)
+
+
+# Excel gravado linha a linha no modo constant_memory do xlsxwriter: cada linha
+# vai para o disco assim que é escrita. Mesmo layout do to_excel (cabeçalho em
+# negrito com borda, vazios em branco, datas como data/hora). 'abas' liga o
+# nome de cada aba ao seu DataFrame, na ordem em que aparecem no arquivo.
+def _gravar_xlsx(abas, arquivo, progresso=None):
+    livro = xlsxwriter.Workbook(arquivo, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'nan_inf_to_errors': True,
+    })
+    cabecalho = livro.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    total = sum(len(df) for df in abas.values())
+    gravadas = 0
+    for aba, df in abas.items():
+        planilha = livro.add_worksheet(aba)
+        planilha.add_write_handler(datetime, _escrever_data)
+        planilha.add_write_handler(pd.Timestamp, _escrever_data)
+        planilha.write_row(0, 0, [str(coluna) for coluna in df.columns], cabecalho)
+
+        # Andamento do arquivo inteiro, não só da aba
+        def progresso_aba(fracao, antes=gravadas, linhas=len(df)):
+            if progresso is not None:
+                progresso((antes + fracao * linhas) / total)
+
+        linha = 1
+        for lote in _lotes(df, progresso_aba):
+            colunas = [lote[coluna].astype(object).where(lote[coluna].notna(), None).tolist() for coluna in lote.columns]
+            for valores in zip(*colunas):
+                planilha.write_row(linha, 0, valores)
+                linha += 1
+        gravadas += len(df)
+    livro.close()
+
+
+def _gravar_csv(df, arquivo, compactar=False, progresso=None):
+    abrir = gzip.open if compactar else open
+    with abrir(arquivo, 'wt', newline='', encoding='utf-8') as saida:
+        for i, lote in enumerate(_lotes(df, progresso)):
+            lote.to_csv(saida, header=(i == 0), index=False)
+
+
+def _gravar_parquet(df, arquivo, progresso=None):
+    escritor = None
+    try:
+        for lote in _lotes(df, progresso):
+            if escritor is None:
+                tabela = pa.Table.from_pandas(lote, preserve_index=False)
+                escritor = pq.ParquetWriter(arquivo, tabela.schema)
+            else:
+                tabela = pa.Table.from_pandas(lote, schema=escritor.schema, preserve_index=False)
+            escritor.write_table(tabela)
+        if escritor is None:
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), arquivo)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+# Gera o arquivo do relatório no formato pedido ('xlsx', 'csv', 'csv.gz' ou
+# 'parquet'), gravando em lotes em um arquivo temporário, e devolve o conteúdo.
+# Um dicionário {aba: DataFrame} gera uma planilha Excel com várias abas.
+def gerar_arquivo(df, extensao='xlsx', progresso=None):
+    descritor, arquivo = tempfile.mkstemp(suffix=f'.{extensao}')
+    os.close(descritor)
+    try:
+        if isinstance(df, dict):
+            if extensao != 'xlsx':
+                raise ValueError('Várias abas só podem ser exportadas em Excel (.xlsx)')
+            _gravar_xlsx(df, arquivo, progresso=progresso)
+        elif extensao == 'xlsx':
+            _gravar_xlsx({'Relatório': df}, arquivo, progresso=progresso)
+        elif extensao == 'csv':
+            _gravar_csv(df, arquivo, progresso=progresso)
+        elif extensao == 'csv.gz':
+            _gravar_csv(df, arquivo, compactar=True, progresso=progresso)
+        elif extensao == 'parquet':
+            _gravar_parquet(df, arquivo, progresso=progresso)
+        else:
+            raise ValueError(f'Formato de exportação desconhecido: {extensao}')
+        with open(arquivo, 'rb') as entrada:
+            return entrada.read()
+    finally:
+        os.remove(arquivo)
+
+
+# Grava a planilha Excel (um DataFrame ou {aba: DataFrame}) direto no arquivo
+def gravar_excel(df, arquivo, aba='Relatório'):
+    _gravar_xlsx(df if isinstance(df, dict) else {aba: df}, arquivo)
+
+
+# Fila por onde os processos do pool mandam o andamento (tarefa, fração); é
+# entregue a cada processo quando ele sobe
+_progresso = None
+
+
+def _iniciar_processo(progresso):
+    global _progresso
+    _progresso = progresso
+
+
+# Roda em um processo do pool: gera o arquivo e publica o andamento na fila
+def _gerar_em_processo(df, extensao, tarefa):
+    def progresso(fracao):
+        _progresso.put((tarefa, fracao))
+    return gerar_arquivo(df, extensao, progresso)
+
+
+# Sob o streamlit run, o __main__ é o script do app; com o spawn, cada processo
+# novo rodaria o app inteiro (planilha, observador, página) antes de trabalhar.
+# Enquanto os processos sobem, o __main__ vira um módulo vazio, sem __file__.
+@contextlib.contextmanager
+def _sem_script_principal():
+    principal = sys.modules['__main__']
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = principal
+
+
+# Fila de exportações: os arquivos são gerados em processos separados, então a
+# página continua respondendo enquanto a planilha é escrita. Pedidos iguais
+# (mesma chave) feitos ao mesmo tempo, de qualquer sessão, esperam pela mesma
+# tarefa; os arquivos prontos ficam no cache, limitado pelo tamanho em bytes.
+class FilaExportacoes:
+    def __init__(self, max_processos=2, max_bytes=128 * 2**20, max_entradas=64):
+        self.cache = CacheLRU(max_entradas=max_entradas, max_bytes=max_bytes, medir=len)
+        self.max_processos = max_processos
+        self._lock = threading.Lock()
+        self._pool = None
+        self._progresso = None
+        self._andamento = {}
+        self._tarefas = {}
+        self._erros = {}
+        self._proxima = 0
+
+    # O pool e a fila de andamento só sobem na primeira exportação; chamar com
+    # o lock
+    def _iniciar(self):
+        if self._pool is None:
+            contexto = multiprocessing.get_context('spawn')
+            self._progresso = contexto.Queue()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_processos, mp_context=contexto,
+                initializer=_iniciar_processo, initargs=(self._progresso,),
+            )
+
+    # Traz para self._andamento o que os processos publicaram; chamar com o lock
+    def _ler_andamento(self):
+        if self._progresso is None:
+            return
+        try:
+            while True:
+                tarefa, fracao = self._progresso.get_nowait()
+                if tarefa in self._andamento:
+                    self._andamento[tarefa] = fracao
+        except queue.Empty:
+            pass
+
+    # Coloca a geração do arquivo na fila, a não ser que ele já esteja pronto
+    # ou sendo gerado. O DataFrame é montado fora da trava, para não segurar a
+    # situação() das outras sessões; a chave é conferida de novo antes de enviar.
+    def enviar(self, chave, dados, extensao):
+        with self._lock:
+            if self._pedido(chave):
+                return
+        df = dados() if callable(dados) else dados
+        with self._lock:
+            if self._pedido(chave):
+                return
+            self._iniciar()
+            self._erros.pop(chave, None)
+            tarefa = self._proxima
+            self._proxima += 1
+            self._andamento[tarefa] = 0.0
+            # Os processos do pool sobem no submit, conforme a demanda
+            with _sem_script_principal():
+                futuro = self._pool.submit(_gerar_em_processo, df, extensao, tarefa)
+            self._tarefas[chave] = (tarefa, futuro)
+        futuro.add_done_callback(lambda futuro: self._concluir(chave))
+
+    # Se o arquivo já está pronto ou sendo gerado; chamar com a trava
+    def _pedido(self, chave):
+        return chave in self._tarefas or self.cache.procurar(chave) is not None
+
+    def _concluir(self, chave):
+        with self._lock:
+            tarefa, futuro = self._tarefas[chave]
+            self._ler_andamento()
+            try:
+                conteudo = futuro.result()
+                self.cache.guardar(chave, conteudo)
+            except Exception as erro:
+                self._erros[chave] = erro
+                # Um processo que morreu inutiliza o pool; o próximo pedido sobe outro
+                if isinstance(erro, BrokenProcessPool):
+                    self._pool = None
+            del self._tarefas[chave]
+            self._andamento.pop(tarefa, None)
+
+    # Situação da exportação: ('pronto', bytes), ('gerando', fração),
+    # ('erro', exceção) ou (None, None) quando ninguém pediu o arquivo
+    def situacao(self, chave):
+        with self._lock:
+            conteudo = self.cache.procurar(chave)
+            if conteudo is not None:
+                return 'pronto', conteudo
+            if chave in self._tarefas:
+                self._ler_andamento()
+                return 'gerando', self._andamento.get(self._tarefas[chave][0], 0.0)
+            if chave in self._erros:
+                return 'erro', self._erros[chave]
+            return None, None
+
+    def estatisticas(self):
+        estatisticas = self.cache.estatisticas()
+        with self._lock:
+            estatisticas['em_andamento'] = len(self._tarefas)
+        return estatisticas
+
+
+# Uma única fila de exportações (e um único pool) para o processo do Streamlit
+@st.cache_resource
+def obter_fila_exportacoes():
+    return FilaExportacoes()
+
+
+# Enquanto o arquivo é gerado, só este trecho da página é refeito (a cada
+# segundo) para mostrar o andamento; quando fica pronto, a página é refeita
+# para aparecer o botão de baixar
+def _acompanhar(fila, chave):
+    @st.fragment(run_every=1)
+    def acompanhar():
+        situacao, valor = fila.situacao(chave)
+        if situacao == 'gerando':
+            st.progress(valor, text=f"Gerando o arquivo... {valor:.0%}")
+        else:
+            st.rerun()
+
+    acompanhar()
+
+
+# Exportação sob demanda: o arquivo só é gerado quando alguém clica em
+# "Exportar Relatório" e fica guardado pela chave (fila, filtros e versão da
+# planilha), de modo que o próximo pedido igual já mostra o botão de baixar.
+# 'dados' pode ser o DataFrame ou uma função que o monta, para nem separar as
+# colunas enquanto ninguém pede o arquivo. 'nome' vai sem a extensão.
+def exportar(dados, chave, nome, formato='Excel (.xlsx)', rotulo="Exportar Relatório"):
+    extensao, mime = FORMATOS[formato]
+    nome_arquivo = f'{nome}.{extensao}'
+    fila = obter_fila_exportacoes()
+    chave = (extensao, nome_arquivo, chave)
+    situacao, valor = fila.situacao(chave)
+    if situacao == 'gerando':
+        _acompanhar(fila, chave)
+        return
+    if situacao != 'pronto':
+        if situacao == 'erro':
+            st.error(f"Não foi possível gerar o arquivo: {valor}")
+        if st.button(rotulo, key=f"gerar_{nome}"):
+            fila.enviar(chave, dados, extensao)
+            _acompanhar(fila, chave)
+        return
+
+    st.download_button(
+        label="Baixar Relatório",
+        data=valor,
+        file_name=nome_arquivo,
+        mime=mime,
+        key=f"baixar_{nome}",
+    )
+
+
+def exportar_excel(dados, chave, nome_arquivo, rotulo="Exportar Relatório"):
+    exportar(dados, chave, os.path.splitext(nome_arquivo)[0], 'Excel (.xlsx)', rotulo)
+
+
+# Exportação com escolha do formato, para relatórios grandes
+def exportar_com_formato(dados, chave, nome, rotulo="Exportar Relatório"):
+    formato = st.selectbox("Formato do relatório", list(FORMATOS), key=f"formato_{nome}")
+    exportar(dados, chave, nome, formato, rotulo)
@@ -0,0 +1,224 @@
+import itertools
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import streamlit as st
+from exclusoes import mascara_excluidos
+from filtros import MotorFiltro, obter_cache_filtros
+from indicadores import CuboKPI, IndiceProdutos, faturamento_mensal, tabela_indicadores
+
+# Filas de trabalho, na ordem em que aparecem no sistema
+FILAS = ['Separação', 'Compras', 'Embalagem', 'Expedição', 'Não gerado OE']
+
+# Nome usado para a carteira inteira (todas as filas, inclusive entregues)
+CARTEIRA = 'Carteira'
+
+
+# Classifica todas as linhas da carteira em uma única passada. Devolve só as
+# linhas válidas (fora da lista de clientes excluídos), com as colunas pedidas
+# e a coluna categórica 'Fila'.
+def classificar_filas(df, colunas, exclusoes):
+    validas = (
+        df['Ped. Cliente'].notna()
+        & ~mascara_excluidos(df['Ped. Cliente'], exclusoes)
+        & df['Nr.pedido'].notna()
+    ).to_numpy()
+
+    com_sufixo = df['Nr.pedido'].str.contains('-', regex=False, na=False).to_numpy(dtype=bool)
+    sem_origem = (df['Origem'].isna() | (df['Origem'] == '')).to_numpy()
+    produzida = df['Qtd. Produzida']
+    liberar = df['Qtd.a liberar']
+
+    # A primeira condição verdadeira define a fila da linha; quantidades vazias
+    # não satisfazem nenhuma comparação
+    fila = np.select(
+        [
+            ~com_sufixo,
+            sem_origem,
+            ((produzida == 0) & (liberar == 0)).to_numpy(dtype=bool, na_value=False),
+            ((produzida == 0) & (liberar > 0)).to_numpy(dtype=bool, na_value=False),
+            ((produzida > 0) & (liberar > 0)).to_numpy(dtype=bool, na_value=False),
+        ],
+        ['Separação', 'Não gerado OE', 'Compras', 'Embalagem', 'Expedição'],
+        default=None,
+    )
+
+    # As datas já chegam convertidas pelo esquema da planilha (dados.ESQUEMA)
+    base = df.loc[validas, colunas].assign(
+        Fila=pd.Categorical(fila[validas], categories=FILAS),
+    )
+    return base
+
+
+# Status possíveis, em ordem alfabética (a mesma dos agrupamentos por Status)
+STATUS = ['Atrasado', 'Entregue', 'Pendente']
+
+
+# Regra de Status da carteira. O "agora" pode ser informado para deixar a regra
+# de Atrasado previsível (testes, comparações de desempenho).
+def calcular_status(base, agora=None):
+    if agora is None:
+        agora = datetime.now()
+    faturado = base['Dt.fat.'].notna()
+    atrasado = (base['Prev.entrega'] < agora) & ~faturado
+    status = np.select([faturado, atrasado], ['Entregue', 'Atrasado'], default='Pendente')
+    return pd.Series(pd.Categorical(status, categories=STATUS), index=base.index)
+
+
+# Cada montagem da carteira recebe um número próprio: a mesma versão da
+# planilha com outra lista de clientes excluídos tem outras linhas
+_montagens = itertools.count()
+
+
+# Carteira já classificada de uma versão da planilha. O Status só muda quando
+# vira o dia (as previsões de entrega são datas), então a carteira com Status e
+# as visões por fila são montadas uma vez por dia e reaproveitadas; as filas
+# só são separadas quando alguém pede uma delas.
+class FilasClassificadas:
+    def __init__(self, base, versao=None):
+        self.base = base
+        self.versao = versao
+        # Identifica estas linhas nas chaves dos caches compartilhados
+        # (filtros, páginas da tabela, exportações)
+        self.identidade = (versao, next(_montagens))
+        self._lock = threading.Lock()
+        self._dia = None
+        self._carteira = None
+        self._em_aberto = None
+        self._filas = {}
+        self._motores = {}
+        self._cubo = None
+        self._faturamento = None
+        self._produtos = None
+
+    # Carteira do dia com Status; as filas saem dela sob demanda (_separar_filas)
+    def _montar(self, agora):
+        status = calcular_status(self.base, agora)
+        carteira = self.base.drop(columns='Fila').assign(Status=status)
+        self._em_aberto = (status != 'Entregue').to_numpy()
+        return carteira
+
+    # Visão de uma fila (sem os itens já entregues); chamar com o lock
+    def _fila(self, nome):
+        self._separar_filas()
+        return self._filas[nome]
+
+    # As filas do dia saem todas de uma passada só, na primeira vez que alguma
+    # é pedida: uma ordenação estável pelo código da fila separa as linhas de
+    # cada uma, na ordem da carteira; chamar com o lock
+    def _separar_filas(self):
+        if self._filas:
+            return
+        codigos = np.where(self._em_aberto, self.base['Fila'].cat.codes.to_numpy(), -1)
+        ordem = np.argsort(codigos, kind='stable')
+        limites = np.searchsorted(codigos[ordem], np.arange(len(FILAS) + 1))
+        for i, nome in enumerate(FILAS):
+            self._filas[nome] = self._carteira.take(ordem[limites[i]:limites[i + 1]])
+
+    # Refaz a carteira do dia quando o dia muda; chamar com o lock
+    def _atualizar(self, agora):
+        if agora is None:
+            agora = datetime.now()
+        if self._dia != agora.date():
+            self._carteira = self._montar(agora)
+            self._filas = {}
+            self._motores = {}
+            self._cubo = None
+            self._dia = agora.date()
+
+    # Devolve a carteira com Status e uma visão por fila (sem os itens já
+    # entregues). Cada chamada recebe cópias rasas, que a sessão pode alterar.
+    def montar(self, agora=None):
+        with self._lock:
+            self._atualizar(agora)
+            carteira = self._carteira
+            filas = {nome: self._fila(nome) for nome in FILAS}
+        return carteira.copy(deep=False), {nome: fila.copy(deep=False) for nome, fila in filas.items()}
+
+    # Motor de filtros de uma fila (ou da 'Carteira'), montado na primeira vez
+    # que a fila é aberta no dia
+    def motor(self, nome, agora=None):
+        return self._motor_do_dia(nome, agora)[1]
+
+    def _motor_do_dia(self, nome, agora):
+        with self._lock:
+            self._atualizar(agora)
+            if nome not in self._motores:
+                frame = self._carteira if nome == CARTEIRA else self._fila(nome)
+                self._motores[nome] = MotorFiltro(frame)
+            return self._dia, self._motores[nome]
+
+    # Cubo de indicadores da carteira do dia, usado no dashboard
+    def cubo(self, agora=None):
+        with self._lock:
+            self._atualizar(agora)
+            if self._cubo is None:
+                self._cubo = CuboKPI(self._carteira)
+            return self._cubo
+
+    # Faturamento mensal dos itens entregues. Não depende do dia (Entregue é
+    # ter Dt.fat.), então é calculado uma vez por versão da planilha.
+    def faturamento_mensal(self):
+        with self._lock:
+            if self._faturamento is None:
+                self._faturamento = faturamento_mensal(self.base)
+            return self._faturamento.copy(deep=False)
+
+    # Conteúdo da planilha "todos os setores": uma aba de resumo com os
+    # indicadores do período e uma aba por fila (itens em aberto, com as
+    # colunas pedidas), tudo tirado da mesma passada sobre a carteira do dia
+    def pasta_setores(self, colunas, data_inicial=None, data_final=None, agora=None):
+        with self._lock:
+            self._atualizar(agora)
+            filas = {nome: self._fila(nome)[colunas] for nome in FILAS}
+        cubo = self.cubo(agora)
+        # Setores na ordem das filas; os que não são fila vêm depois, em ordem alfabética
+        setores = sorted(cubo.setores, key=lambda setor: (FILAS.index(setor) if setor in FILAS else len(FILAS), setor))
+        resumo = tabela_indicadores(cubo.consultar(data_inicial, data_final), setores, filas)
+        return {'Resumo': resumo, **filas}
+
+    # Índice de frequência de produtos da carteira; como o faturamento, não
+    # depende do dia e é montado uma vez por versão da planilha
+    def produtos(self):
+        with self._lock:
+            if self._produtos is None:
+                self._produtos = IndiceProdutos(self.base)
+            return self._produtos
+
+    # Chave de um resultado tirado destas linhas no dia (filtro de uma fila,
+    # página da tabela, arquivo exportado): a montagem, o dia, o nome e os
+    # filtros. As planilhas exportadas só são geradas quando pedidas e ficam
+    # guardadas por esta chave.
+    def chave(self, nome, *filtros, dia=None):
+        if dia is None:
+            dia = datetime.now().date()
+        return (self.identidade, dia, nome, *filtros)
+
+    # Resumo (itens, Valor Total, itens por Status) das linhas de uma fila que
+    # atendem aos filtros. Vem do cache de filtros quando a mesma combinação já
+    # foi pedida na versão e no dia atuais; resumo.chave identifica a
+    # combinação (usada pela tabela paginada).
+    def resumir(self, nome, filtros=None, data_inicial=None, data_final=None, agora=None, cache=None):
+        return self._resumir(nome, filtros, data_inicial, data_final, agora, cache)[1]
+
+    def _resumir(self, nome, filtros, data_inicial, data_final, agora, cache):
+        dia, motor = self._motor_do_dia(nome, agora)
+        if cache is None:
+            cache = obter_cache_filtros()
+        filtros = filtros or {}
+        chave = self.chave(nome, tuple(filtros.items()), data_inicial, data_final, dia=dia)
+        resultado = cache.obter(chave, lambda: motor.resumir(filtros, data_inicial, data_final, chave))
+        return motor, resultado
+
+    # Linhas filtradas de uma fila e o resumo delas
+    def consultar(self, nome, filtros=None, data_inicial=None, data_final=None, agora=None, cache=None):
+        motor, resultado = self._resumir(nome, filtros, data_inicial, data_final, agora, cache)
+        return motor.frame.take(resultado.posicoes), resultado
+
+
+# A classificação só é refeita quando muda a versão da planilha ou a lista
+# de clientes excluídos
+@st.cache_resource(max_entries=2)
+def preparar_filas(versao, _df, colunas, exclusoes):
+    return FilasClassificadas(classificar_filas(_df, colunas, exclusoes), versao)
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from cache import CacheLRU
+from indicadores import IndiceTemporal
+
+# Valor dos selectbox que significa "sem filtro"
+TODOS = "Todos"
+
+# Colunas que podem ser filtradas por valor nas telas
+CHAVES_FILTRO = ('Fantasia', 'Ped. Cliente', 'Status', 'Setor')
+
+
+# Índice invertido de uma fila: para cada valor das colunas de filtro, a lista
+# ordenada das linhas onde ele aparece, e as datas do pedido ordenadas para
+# buscar intervalos por busca binária. É montado uma vez por versão dos dados;
+# cada filtro depois só cruza listas de posições, sem copiar a fila inteira.
+class MotorFiltro:
+    def __init__(self, frame, chaves=CHAVES_FILTRO, coluna_data='Dt.pedido'):
+        self.frame = frame
+        self.opcoes = {}
+        self._postings = {}
+        for coluna in chaves:
+            if coluna not in frame.columns:
+                continue
+            # Mesma lista (e ordem) que o unique() usado nos selectbox
+            self.opcoes[coluna] = list(frame[coluna].unique())
+            codigos, valores = pd.factorize(frame[coluna])
+            ordem = np.argsort(codigos, kind='stable')
+            limites = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+            self._postings[coluna] = {
+                valor: ordem[limites[i]:limites[i + 1]] for i, valor in enumerate(valores)
+            }
+
+        datas = frame[coluna_data].to_numpy()
+        ordem = np.argsort(datas, kind='stable')
+        # Datas vazias (NaT) ficam no fim da ordenação e nunca entram em um intervalo
+        ordem = ordem[~np.isnat(datas[ordem])]
+        self._ordem_datas = ordem
+        self._datas = datas[ordem]
+
+        # Somas acumuladas na ordem das datas: com só o filtro de datas, o
+        # Valor Total e os itens por Status saem sem percorrer as linhas
+        codigos_status, self._status = pd.factorize(frame['Status'])
+        por_status = np.zeros((len(frame), len(self._status)), dtype=np.int32)
+        com_status = codigos_status >= 0
+        por_status[np.flatnonzero(com_status), codigos_status[com_status]] = 1
+        self.indice = IndiceTemporal(self._datas, {
+            'Valor Total': frame['Valor Total'].to_numpy(dtype='float64', na_value=0.0)[ordem],
+            'Status': por_status[ordem],
+        })
+
+    def __len__(self):
+        return len(self.frame)
+
+    # Posições (em ordem) das linhas que atendem a todos os filtros. Filtros com
+    # valor None ou "Todos" são ignorados; as datas são inclusivas nas duas pontas.
+    def posicoes(self, filtros=None, data_inicial=None, data_final=None):
+        listas = []
+        for coluna, valor in (filtros or {}).items():
+            if valor is None or (isinstance(valor, str) and valor == TODOS):
+                continue
+            listas.append(self._postings[coluna].get(valor, np.empty(0, dtype=np.intp)))
+
+        if data_inicial is not None or data_final is not None:
+            inicio = 0 if data_inicial is None else np.searchsorted(self._datas, np.datetime64(data_inicial), side='left')
+            fim = len(self._datas) if data_final is None else np.searchsorted(self._datas, np.datetime64(data_final), side='right')
+            listas.append(np.sort(self._ordem_datas[inicio:fim]))
+
+        if not listas:
+            return np.arange(len(self.frame))
+        # Cruza começando pela menor lista
+        listas.sort(key=len)
+        resultado = listas[0]
+        for lista in listas[1:]:
+            if not len(resultado):
+                break
+            resultado = np.intersect1d(resultado, lista, assume_unique=True)
+        return resultado
+
+    # Posições, total e contagens por Status das linhas que atendem aos filtros
+    def resumir(self, filtros=None, data_inicial=None, data_final=None, chave=None):
+        posicoes = self.posicoes(filtros, data_inicial, data_final)
+        so_datas = all(valor is None or (isinstance(valor, str) and valor == TODOS) for valor in (filtros or {}).values())
+        if so_datas and (data_inicial is not None or data_final is not None):
+            inicio, fim = self.indice.faixa(data_inicial, data_final)
+            contagens = self.indice.somar_faixa('Status', inicio, fim)
+            valor_total = self.indice.somar_faixa('Valor Total', inicio, fim) if fim > inicio else 0.0
+            por_status = {valor: int(n) for valor, n in zip(self._status, contagens)}
+        else:
+            valor_total = self.frame['Valor Total'].take(posicoes).sum()
+            por_status = {k: int(v) for k, v in self.frame['Status'].take(posicoes).value_counts().items()}
+        return ResultadoFiltro(posicoes, valor_total, por_status, chave)
+
+
+# O que fica guardado de um filtro: as posições das linhas (não as linhas em si),
+# o Valor Total e a quantidade de itens por Status
+class ResultadoFiltro:
+    def __init__(self, posicoes, valor_total, por_status, chave=None):
+        self.posicoes = posicoes
+        self.chave = chave
+        self.valor_total = valor_total
+        self.por_status = por_status
+
+    @property
+    def itens(self):
+        return len(self.posicoes)
+
+    # Tamanho aproximado em memória, usado no limite do cache
+    @property
+    def tamanho(self):
+        return self.posicoes.nbytes + 256
+
+
+# Um único cache de filtros para o processo do Streamlit
+@st.cache_resource
+def obter_cache_filtros():
+    return CacheLRU(max_bytes=32 * 2**20, max_entradas=512, medir=lambda resultado: resultado.tamanho)
@@ -0,0 +1,104 @@
+import math
+import time
+import hashlib
+import threading
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from cache import CacheLRU
+
+
+# Impressão digital dos dados agregados que alimentam um gráfico
+def impressao(dados):
+    resumo = hashlib.sha1()
+    if isinstance(dados, (pd.DataFrame, pd.Series)):
+        colunas = dados.columns if isinstance(dados, pd.DataFrame) else [dados.name]
+        resumo.update(repr(list(colunas)).encode())
+        resumo.update(pd.util.hash_pandas_object(dados, index=False).to_numpy().tobytes())
+    else:
+        resumo.update(repr(dados).encode())
+    return resumo.hexdigest()
+
+
+class FiguraGuardada:
+    def __init__(self, figura, segundos):
+        self.figura = figura
+        self.segundos = segundos
+
+
+# Figuras prontas do plotly, reaproveitadas enquanto os números por trás delas
+# não mudam. A chave é o tipo do gráfico + a impressão digital dos dados, então
+# a figura só é montada de novo quando o agregado muda. Guarda também quanto
+# tempo de montagem foi poupado pelos acertos.
+class CacheFiguras:
+    def __init__(self, max_entradas=64):
+        self._cache = CacheLRU(max_entradas=max_entradas)
+        self._lock = threading.Lock()
+        self.segundos_economizados = 0.0
+
+    # Devolve a figura do tipo para esses dados; construir() só é chamado na falta
+    def obter(self, tipo, dados, construir):
+        montada = []
+
+        def calcular():
+            inicio = time.perf_counter()
+            figura = construir()
+            montada.append(True)
+            return FiguraGuardada(figura, time.perf_counter() - inicio)
+
+        entrada = self._cache.obter((tipo, impressao(dados)), calcular)
+        if not montada:
+            with self._lock:
+                self.segundos_economizados += entrada.segundos
+        return entrada.figura
+
+    def estatisticas(self):
+        estatisticas = self._cache.estatisticas()
+        estatisticas['segundos_economizados'] = self.segundos_economizados
+        return estatisticas
+
+
+# Fim da escala dos medidores: o maior valor arredondado para cima em um
+# número "redondo" (1, 2, 5 × potência de 10), para o ponteiro nunca estourar
+def limite_escala(valores):
+    maior = max([v for v in valores if v is not None and not pd.isna(v)] + [1])
+    potencia = 10 ** math.floor(math.log10(maior))
+    for passo in (1, 2, 5, 10):
+        if maior <= passo * potencia:
+            return passo * potencia
+
+
+# Painel com um medidor por setor em uma única figura (uma linha, uma coluna
+# por setor), todos na mesma escala, tirada dos próprios valores
+def figura_indicadores_setor(totais, altura=150):
+    limite = limite_escala([valor for _, valor in totais])
+    largura = 1 / len(totais)
+    fig = go.Figure()
+    for i, (titulo, valor) in enumerate(totais):
+        fig.add_trace(go.Indicator(
+            mode="gauge+number",
+            value=valor,
+            title={'text': titulo, 'font': {'size': 20}},
+            domain={'x': [i * largura + 0.02, (i + 1) * largura - 0.02], 'y': [0, 1]},
+            gauge={
+                'axis': {'range': [0, limite], 'visible': False},
+                'bar': {'color': "rgb(9, 71, 128)"},
+                'bgcolor': "white",
+                'borderwidth': 1.5,
+                'bordercolor': "skyblue",
+                'steps': [
+                    {'range': [0, limite], 'color': 'lightgray'}
+                ],
+            }
+        ))
+    fig.update_layout(
+        margin=dict(l=10, r=10, t=40, b=10),
+        height=altura,
+    )
+    return fig
+
+
+# Um único cache de figuras para o processo do Streamlit
+@st.cache_resource
+def obter_cache_figuras():
+    return CacheFiguras()
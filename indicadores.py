@@ -0,0 +1,245 @@
+import numpy as np
+import pandas as pd
+
+# Tabela de bits ligados por byte, para contar os elementos de um bitmap
+_BITS_POR_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+# Bitmap exato dos valores distintos de uma coluna em cada data: uma linha de
+# bits por data, um bit por valor. A união de várias datas é um OU dos bitmaps
+# e a quantidade de distintos é o número de bits ligados; vazios não contam,
+# como no nunique().
+class BitmapDistintos:
+    def __init__(self, posicao_data, coluna, datas):
+        codigos, valores = pd.factorize(coluna)
+        self.valores = valores
+        validos = codigos >= 0
+        # Liga os bits direto no bitmap compactado (8 valores por byte), sem
+        # montar a matriz datas × valores inteira em memória
+        codigos = codigos[validos]
+        self._bits = np.zeros((datas, (len(valores) + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(
+            self._bits,
+            (posicao_data[validos], codigos >> 3),
+            (0x80 >> (codigos & 7)).astype(np.uint8),
+        )
+
+    # Bitmap da união das datas [inicio, fim)
+    def unir(self, inicio, fim):
+        if fim <= inicio:
+            return np.zeros(self._bits.shape[1], dtype=np.uint8)
+        return np.bitwise_or.reduce(self._bits[inicio:fim], axis=0)
+
+    def contar(self, inicio, fim):
+        return int(_BITS_POR_BYTE[self.unir(inicio, fim)].sum())
+
+
+# Índice temporal por somas acumuladas: as medidas ficam na ordem das datas
+# (já ordenadas) com uma linha de zeros no início, e o total de qualquer
+# intervalo é acumulado[fim] - acumulado[inicio], com as duas posições
+# achadas por busca binária. Cada medida pode ter dimensões extras (ex.:
+# Setor × Status), somadas todas de uma vez.
+class IndiceTemporal:
+    def __init__(self, datas, medidas):
+        self.datas = datas
+        self._acumulados = {}
+        for nome, valores in medidas.items():
+            valores = np.asarray(valores)
+            zeros = np.zeros((1,) + valores.shape[1:], dtype=valores.dtype)
+            self._acumulados[nome] = np.concatenate([zeros, np.cumsum(valores, axis=0)])
+
+    def __len__(self):
+        return len(self.datas)
+
+    # Faixa [inicio, fim) das datas dentro do intervalo (inclusivo nas duas pontas)
+    def faixa(self, data_inicial=None, data_final=None):
+        inicio = 0 if data_inicial is None else np.searchsorted(self.datas, np.datetime64(data_inicial), side='left')
+        fim = len(self.datas) if data_final is None else np.searchsorted(self.datas, np.datetime64(data_final), side='right')
+        return int(inicio), int(max(inicio, fim))
+
+    # Soma da medida entre as posições [inicio, fim) da faixa
+    def somar_faixa(self, nome, inicio, fim):
+        acumulado = self._acumulados[nome]
+        return acumulado[fim] - acumulado[inicio]
+
+    def somar(self, nome, data_inicial=None, data_final=None):
+        return self.somar_faixa(nome, *self.faixa(data_inicial, data_final))
+
+
+# Cubo de indicadores da carteira: para cada data do pedido × Setor × Status,
+# a quantidade de itens, a soma do Valor Total e a soma da Qtd., além dos
+# bitmaps de pedidos e modelos distintos por data. É montado uma vez por
+# versão da planilha (e por dia, junto com o Status); um intervalo de datas
+# qualquer é respondido pelas somas acumuladas do IndiceTemporal.
+class CuboKPI:
+    def __init__(self, carteira, coluna_data='Dt.pedido'):
+        datas = carteira[coluna_data].to_numpy()
+        com_data = ~np.isnat(datas)
+        carteira = carteira[com_data]
+        # As "datas" do cubo são os valores distintos de Dt.pedido, então os
+        # limites do intervalo valem exatamente como no filtro >= / <=
+        self.datas, posicao = np.unique(datas[com_data], return_inverse=True)
+
+        codigos_setor, self.setores = pd.factorize(carteira['Setor'])
+        codigos_status, self.status = pd.factorize(carteira['Status'])
+        # Setor vazio fica na última posição
+        codigos_setor = np.where(codigos_setor < 0, len(self.setores), codigos_setor)
+        codigos_status = np.where(codigos_status < 0, len(self.status), codigos_status)
+
+        forma = (len(self.datas), len(self.setores) + 1, len(self.status) + 1)
+        celula = np.ravel_multi_index((posicao, codigos_setor, codigos_status), forma)
+        tamanho = int(np.prod(forma))
+        valor = carteira['Valor Total'].to_numpy(dtype='float64', na_value=0.0)
+        qtd = carteira['Qtd.'].to_numpy(dtype='float64', na_value=0.0)
+        # Somas acumuladas por data, para cada célula Setor × Status
+        self.indice = IndiceTemporal(self.datas, {
+            'itens': np.bincount(celula, minlength=tamanho).reshape(forma),
+            'valor_total': np.bincount(celula, weights=valor, minlength=tamanho).reshape(forma),
+            'quantidade': np.bincount(celula, weights=qtd, minlength=tamanho).reshape(forma),
+        })
+
+        self.pedidos = BitmapDistintos(posicao, carteira['Ped. Cliente'], len(self.datas))
+        self.modelos = BitmapDistintos(posicao, carteira['Modelo'], len(self.datas))
+
+    def consultar(self, data_inicial=None, data_final=None):
+        inicio, fim = self.indice.faixa(data_inicial, data_final)
+        return ResumoKPI(self, inicio, fim)
+
+
+# Indicadores de um intervalo de datas, já somados por Setor × Status
+class ResumoKPI:
+    def __init__(self, cubo, inicio, fim):
+        self._cubo = cubo
+        self._inicio, self._fim = inicio, fim
+        self._itens = cubo.indice.somar_faixa('itens', inicio, fim)
+        # Células sem itens no intervalo ficam zeradas, sem o resíduo da subtração
+        vazias = self._itens == 0
+        self._valor_total = np.where(vazias, 0.0, cubo.indice.somar_faixa('valor_total', inicio, fim))
+        self._quantidade = np.where(vazias, 0.0, cubo.indice.somar_faixa('quantidade', inicio, fim))
+
+    # Fatia das células para um Setor e/ou Status (None = todos)
+    def _fatia(self, matriz, setor, status):
+        linhas = slice(None) if setor is None else _posicao(self._cubo.setores, setor)
+        colunas = slice(None) if status is None else _posicao(self._cubo.status, status)
+        if linhas is None or colunas is None:
+            return 0
+        return matriz[linhas, colunas].sum()
+
+    def itens(self, setor=None, status=None):
+        return int(self._fatia(self._itens, setor, status))
+
+    def valor_total(self, setor=None, status=None):
+        return float(self._fatia(self._valor_total, setor, status))
+
+    def quantidade(self, setor=None, status=None):
+        return float(self._fatia(self._quantidade, setor, status))
+
+    # Quantidade de Ped. Cliente distintos no intervalo
+    def pedidos(self):
+        return self._cubo.pedidos.contar(self._inicio, self._fim)
+
+    # Quantidade de Modelos distintos no intervalo
+    def modelos(self):
+        return self._cubo.modelos.contar(self._inicio, self._fim)
+
+
+# Indicadores do dashboard em forma de tabela (Indicador, Valor), para a aba de
+# resumo das exportações; 'filas' dá os itens em aberto de cada fila
+def tabela_indicadores(kpi, setores, filas):
+    linhas = [
+        ('Total de Pedidos', kpi.pedidos()),
+        ('Modelos Distintos', kpi.modelos()),
+        ('Total de Cartelas', float(kpi.quantidade())),
+        ('Itens Pendentes', kpi.itens(status='Pendente')),
+        ('Itens Atrasados', kpi.itens(status='Atrasado')),
+        ('Faturamento Total', float(kpi.valor_total(status='Entregue'))),
+        ('Valor Total de Saldo', float(kpi.valor_total(status='Pendente') + kpi.valor_total(status='Atrasado'))),
+    ]
+    for setor in setores:
+        linhas.append((f'Itens - {setor}', kpi.itens(setor=setor)))
+        linhas.append((f'Valor Total - {setor}', float(kpi.valor_total(setor=setor))))
+    for nome, fila in filas.items():
+        linhas.append((f'Itens em Aberto - {nome}', len(fila)))
+    return pd.DataFrame(linhas, columns=['Indicador', 'Valor'], dtype=object)
+
+
+def _posicao(valores, valor):
+    encontrados = np.flatnonzero(np.asarray(valores) == valor)
+    return int(encontrados[0]) if len(encontrados) else None
+
+
+# Nome da barra que junta os produtos fora do ranking
+OUTROS = 'Outros'
+
+
+# Índice de frequência de produtos: quantos itens de cada produto foram pedidos
+# em cada data, guardado como pares (data, produto, contagem) em ordem de data.
+# O ranking de um período soma só os pares das datas dentro dele, sem voltar
+# às linhas da carteira.
+class IndiceProdutos:
+    def __init__(self, base, coluna_data='Dt.pedido'):
+        codigos, self.produtos = pd.factorize(base['Produto'])
+        datas = base[coluna_data].to_numpy()
+        validas = (codigos >= 0) & ~np.isnat(datas)
+
+        ordem = np.lexsort((codigos[validas], datas[validas]))
+        datas_ordenadas = datas[validas][ordem]
+        codigos_ordenados = codigos[validas][ordem]
+        # Um par por (data, produto) distinto, com a quantidade de itens
+        novo = np.ones(len(ordem), dtype=bool)
+        novo[1:] = (datas_ordenadas[1:] != datas_ordenadas[:-1]) | (codigos_ordenados[1:] != codigos_ordenados[:-1])
+        inicios = np.flatnonzero(novo)
+        self._datas = datas_ordenadas[inicios]
+        self._produtos = codigos_ordenados[inicios]
+        self._contagens = np.diff(np.append(inicios, len(ordem)))
+
+        # Modelos de cada produto, para o texto do gráfico
+        pares = pd.DataFrame({'codigo': codigos, 'Modelo': base['Modelo'].astype(object).to_numpy()})
+        pares = pares[(pares['codigo'] >= 0) & pares['Modelo'].notna()].drop_duplicates()
+        modelos = pares.groupby('codigo')['Modelo'].agg(lambda m: ', '.join(map(str, m)))
+        self.modelos = modelos.reindex(range(len(self.produtos)), fill_value='').to_numpy()
+
+    # Quantidade de itens por produto (na ordem de self.produtos) no período
+    def contagens(self, data_inicial=None, data_final=None):
+        inicio = 0 if data_inicial is None else np.searchsorted(self._datas, np.datetime64(data_inicial), side='left')
+        fim = len(self._datas) if data_final is None else np.searchsorted(self._datas, np.datetime64(data_final), side='right')
+        return np.bincount(self._produtos[inicio:fim], weights=self._contagens[inicio:fim], minlength=len(self.produtos)).astype(np.int64)
+
+    # Os k produtos mais pedidos no período, do maior para o menor, e uma linha
+    # "Outros" com a soma dos demais; o tamanho do resultado não passa de k + 1
+    def ranking(self, data_inicial=None, data_final=None, k=30):
+        contagem = self.contagens(data_inicial, data_final)
+        presentes = np.flatnonzero(contagem)
+        if len(presentes) > k:
+            candidatos = presentes[np.argpartition(-contagem[presentes], k - 1)[:k]]
+        else:
+            candidatos = presentes
+        # Empates ficam na ordem em que o produto aparece na carteira
+        topo = candidatos[np.lexsort((candidatos, -contagem[candidatos]))]
+
+        ranking = pd.DataFrame({
+            'Produto': np.asarray(self.produtos, dtype=object)[topo],
+            'Frequência': contagem[topo],
+            'Modelo': self.modelos[topo],
+        })
+        restante = int(contagem.sum() - contagem[topo].sum())
+        if restante:
+            outros = pd.DataFrame({'Produto': [OUTROS], 'Frequência': [restante], 'Modelo': [f'{len(presentes) - len(topo)} produtos']})
+            ranking = pd.concat([ranking, outros], ignore_index=True)
+        return ranking
+
+
+# Faturamento mensal: Valor Total dos itens entregues por mês do pedido, somado
+# com um np.bincount sobre o mês de cada linha; os textos 'AAAA-MM' só são
+# montados para os meses distintos. Devolve as colunas 'Mes' e 'Valor Total'.
+def faturamento_mensal(base):
+    entregues = base[base['Dt.fat.'].notna() & base['Dt.pedido'].notna()]
+    mes = entregues['Dt.pedido'].to_numpy().astype('datetime64[M]').astype(np.int64)
+    primeiro_mes = mes.min() if len(mes) else 0
+    mes = mes - primeiro_mes
+    valor = entregues['Valor Total'].to_numpy(dtype=float, na_value=0.0)
+    presentes = np.flatnonzero(np.bincount(mes))
+    return pd.DataFrame({
+        'Mes': np.datetime_as_string((presentes + primeiro_mes).astype('datetime64[M]'), unit='M'),
+        'Valor Total': np.bincount(mes, weights=valor)[presentes],
+    })
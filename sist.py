@@ -7,6 +7,10 @@ from io import BytesIO
 import plotly.graph_objects as go
 from streamlit.components.v1 import html
 import plotly.graph_objects as go
+from dados import obter_fonte
+from filas import preparar_filas
+from exclusoes import carregar_exclusoes
+from exportacao import exportar_excel, exportar_com_formato
 
 st.set_page_config(
     page_title="Sistema de Controle",
@@ -85,39 +89,14 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-@st.cache_data
-def carregar_dados():
-    df = pd.read_excel('planilha/controledosistema.xlsx')
-    return df
-
-df = carregar_dados()
-
-if 'dados' not in st.session_state:
-    st.session_state.dados = carregar_dados()
-
-dados = st.session_state.dados
-
-df['Nr.pedido'] = df['Nr.pedido'].astype(str)
-
-separacao = df[~df['Nr.pedido'].str.contains('-')]
-perfil2 = df[df['Nr.pedido'].str.contains('-')]
-
-perfil3 = perfil2[perfil2['Origem'].isna() | (perfil2['Origem'] == '')]
-
-perfil2 = perfil2[~perfil2.index.isin(perfil3.index)]
-
-def definir_data_e_status(dataframe):
-
-    dataframe['Dt.fat.'] = pd.to_datetime(dataframe['Dt.fat.'], errors='coerce')
-    dataframe['Prev.entrega'] = pd.to_datetime(dataframe['Prev.entrega'], errors='coerce')
+CAMINHO_PLANILHA = 'planilha/controledosistema.xlsx'
 
-    dataframe['Status'] = 'Pendente'
-    dataframe.loc[dataframe['Dt.fat.'].notna(), 'Status'] = 'Entregue'
-    dataframe.loc[(dataframe['Prev.entrega'] < datetime.now()) & (dataframe['Dt.fat.'].isna()), 'Status'] = 'Atrasado'
-    
-    return dataframe
+# Um único conjunto de dados para todas as sessões, recarregado em segundo
+# plano quando a planilha muda
+def carregar_dados():
+    return obter_fonte(CAMINHO_PLANILHA).atual()
 
-carteira = df
+versao_dados, df = carregar_dados()
 
 def is_atrasado_pedido(df):
     return (df['Dt.pedido'] + pd.Timedelta(days=1)) < datetime.now()
@@ -194,50 +173,16 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-separacao = separacao[colunas_desejadas]
-perfil2 = perfil2[colunas_desejadas]
-compras = perfil2[(perfil2['Qtd. Produzida'] == 0) & (perfil2['Qtd.a liberar'] == 0)][colunas_desejadas]
-embalagem = perfil2[(perfil2['Qtd. Produzida'] == 0) & (perfil2['Qtd.a liberar'] > 0)][colunas_desejadas]
-expedicao = perfil2[(perfil2['Qtd. Produzida'] > 0) & (perfil2['Qtd.a liberar'] > 0)][colunas_desejadas]
-perfil3 = perfil3[colunas_desejadas]
-carteira = carteira[colunas_desejadas]
-
-separacao = separacao.dropna(subset=['Ped. Cliente'])
-perfil2 = perfil2.dropna(subset=['Ped. Cliente'])
-compras = compras.dropna(subset=['Ped. Cliente'])
-embalagem = embalagem.dropna(subset=['Ped. Cliente'])
-expedicao = expedicao.dropna(subset=['Ped. Cliente'])
-perfil3 = perfil3.dropna(subset=['Ped. Cliente'])
-carteira = carteira.dropna(subset=['Ped. Cliente'])
-
-separacao = definir_data_e_status(separacao)
-perfil2 = definir_data_e_status(perfil2)
-compras = definir_data_e_status(compras)
-embalagem = definir_data_e_status(embalagem)
-expedicao = definir_data_e_status(expedicao)
-perfil3 = definir_data_e_status(perfil3)
-carteira = definir_data_e_status(carteira)
-
-separacao = separacao[(separacao['Ped. Cliente'] != 'TUMELERO') & (separacao['Ped. Cliente'] != 'ESTOQUE FOX') & (separacao['Ped. Cliente'] != 'TELHA 14.10.24') & (separacao['Ped. Cliente'] != 'ESTOQUE FOX') & (separacao['Ped. Cliente'] != 'TELHA 18.10.24') & (separacao['Ped. Cliente'] != 'FANAN/TERUYA') & (separacao['Ped. Cliente'] != 'HC FOX 11.11.24') & (separacao['Ped. Cliente'] != 'TUMELEIRO 2') & (separacao['Ped. Cliente'] != 'AMOSTRAS') & (separacao['Ped. Cliente'] != 'LOJAS 20.12.2024') & (separacao['Ped. Cliente'] != 'SALDO TELHANORTE')]
-compras = compras[(compras['Ped. Cliente'] != 'TUMELERO') & (compras['Ped. Cliente'] != 'ESTOQUE FOX') & (compras['Ped. Cliente'] != 'TELHA 14.10.24') & (compras['Ped. Cliente'] != 'ESTOQUE FOX') & (compras['Ped. Cliente'] != 'TELHA 18.10.24') & (compras['Ped. Cliente'] != 'FANAN/TERUYA') & (compras['Ped. Cliente'] != 'HC FOX 11.11.24') & (compras['Ped. Cliente'] != 'TUMELEIRO 2') & (compras['Ped. Cliente'] != 'AMOSTRAS') & (compras['Ped. Cliente'] != 'LOJAS 20.12.2024') & (compras['Ped. Cliente'] != 'SALDO TELHANORTE')]
-embalagem = embalagem[(embalagem['Ped. Cliente'] != 'TUMELERO') & (embalagem['Ped. Cliente'] != 'ESTOQUE FOX') & (embalagem['Ped. Cliente'] != 'TELHA 14.10.24') & (embalagem['Ped. Cliente'] != 'ESTOQUE FOX') & (embalagem['Ped. Cliente'] != 'TELHA 18.10.24') & (embalagem['Ped. Cliente'] != 'FANAN/TERUYA') & (embalagem['Ped. Cliente'] != 'HC FOX 11.11.24') & (embalagem['Ped. Cliente'] != 'TUMELEIRO 2') & (embalagem['Ped. Cliente'] != 'AMOSTRAS') & (embalagem['Ped. Cliente'] != 'LOJAS 20.12.2024') & (embalagem['Ped. Cliente'] != 'SALDO TELHANORTE')]
-expedicao = expedicao[(expedicao['Ped. Cliente'] != 'TUMELERO') & (expedicao['Ped. Cliente'] != 'ESTOQUE FOX') & (expedicao['Ped. Cliente'] != 'TELHA 14.10.24') & (expedicao['Ped. Cliente'] != 'ESTOQUE FOX') & (expedicao['Ped. Cliente'] != 'TELHA 18.10.24') & (expedicao['Ped. Cliente'] != 'FANAN/TERUYA') & (expedicao['Ped. Cliente'] != 'HC FOX 11.11.24') & (expedicao['Ped. Cliente'] != 'TUMELEIRO 2') & (expedicao['Ped. Cliente'] != 'AMOSTRAS') & (expedicao['Ped. Cliente'] != 'LOJAS 20.12.2024') & (expedicao['Ped. Cliente'] != 'SALDO TELHANORTE')]
-perfil3 = perfil3[(perfil3['Ped. Cliente'] != 'TUMELERO') & (perfil3['Ped. Cliente'] != 'ESTOQUE FOX') & (perfil3['Ped. Cliente'] != 'TELHA 14.10.24') & (perfil3['Ped. Cliente'] != 'ESTOQUE FOX') & (perfil3['Ped. Cliente'] != 'TELHA 18.10.24') & (perfil3['Ped. Cliente'] != 'FANAN/TERUYA') & (perfil3['Ped. Cliente'] != 'HC FOX 11.11.24') & (perfil3['Ped. Cliente'] != 'TUMELEIRO 2') & (perfil3['Ped. Cliente'] != 'AMOSTRAS') & (perfil3['Ped. Cliente'] != 'LOJAS 20.12.2024') & (perfil3['Ped. Cliente'] != 'SALDO TELHANORTE')]
-carteira = carteira[(carteira['Ped. Cliente'] != 'TUMELERO') & (carteira['Ped. Cliente'] != 'ESTOQUE FOX') & (carteira['Ped. Cliente'] != 'TELHA 14.10.24') & (carteira['Ped. Cliente'] != 'ESTOQUE FOX') & (carteira['Ped. Cliente'] != 'TELHA 18.10.24') & (carteira['Ped. Cliente'] != 'FANAN/TERUYA') & (carteira['Ped. Cliente'] != 'HC FOX 11.11.24') & (carteira['Ped. Cliente'] != 'TUMELEIRO 2') & (carteira['Ped. Cliente'] != 'AMOSTRAS') & (carteira['Ped. Cliente'] != 'LOJAS 20.12.2024') & (carteira['Ped. Cliente'] != 'SALDO TELHANORTE')]
-
-separacao = separacao[separacao['Nr.pedido']!= 'nan']
-perfil2 = perfil2[perfil2['Nr.pedido']!= 'nan']
-compras = compras[compras['Nr.pedido']!= 'nan']
-embalagem = embalagem[embalagem['Nr.pedido']!= 'nan']
-expedicao = expedicao[expedicao['Nr.pedido']!= 'nan']
-perfil3 = perfil3[perfil3['Nr.pedido']!= 'nan']
-carteira = carteira[carteira['Nr.pedido']!= 'nan']
-
-separacao = separacao[separacao['Status']!= 'Entregue']
-compras = compras[compras['Status']!= 'Entregue']
-embalagem = embalagem[embalagem['Status']!= 'Entregue']
-expedicao = expedicao[expedicao['Status']!= 'Entregue']
-perfil3 = perfil3[perfil3['Status']!= 'Entregue']
+# Classificação em filas feita uma vez por versão da planilha; o Status é
+# recalculado só quando vira o dia
+filas_classificadas = preparar_filas(versao_dados, df, colunas_desejadas, carregar_exclusoes())
+carteira, filas = filas_classificadas.montar()
+
+separacao = filas['Separação']
+compras = filas['Compras']
+embalagem = filas['Embalagem']
+expedicao = filas['Expedição']
+perfil3 = filas['Não gerado OE']
 
 def formatar_data(data):
     return data.strftime("%d/%m/%Y")
@@ -247,7 +192,6 @@ def guia_carteira():
     
     df_filtrado = carteira
     df_carteira = carteira
-    df_carteira = definir_data_e_status(df_carteira)
 
     col_filter1, col_filter2, col_filter3, col_filter4, col_date_filter1, col_date_filter2 = st.columns(6)
     
@@ -288,28 +232,7 @@ def guia_carteira():
     else:
         st.warning("Nenhum item encontrado com os filtros aplicados.")  
 
-    # Filtrar DataFrame para manter apenas as colunas desejadas
-    df_filtrado = df[colunas_desejadas]
-
-    # Função para gerar o Excel
-    def gerar_excel(df):
-    # Salva o DataFrame em um buffer de memória (BytesIO)
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Relatório')
-        buffer.seek(0)  # Volta o cursor para o início do buffer
-        return buffer
-
-    # Gerar o Excel assim que a página for carregada
-    excel_file = gerar_excel(df_filtrado)
-
-    # Botão para baixar o Excel
-    st.download_button(
-        label="Exportar Relatório",
-        data=excel_file,
-        file_name="relatorio_dataframe.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    exportar_com_formato(lambda: df[colunas_desejadas], filas_classificadas.chave('Carteira'), "relatorio_dataframe")
 
 def guia_dashboard():
 
@@ -321,12 +244,9 @@ def guia_dashboard():
     # Filtrar os dados com base nas datas selecionadas
     df_filtrado = carteira[(carteira['Dt.pedido'] >= data_inicial_filter) & (carteira['Dt.pedido'] <= data_final_filter)]
 
-    produto_frequencia = df_filtrado['Produto'].value_counts().reset_index()
-    produto_frequencia.columns = ['Produto', 'Frequência']
-
-    produto_info = df_filtrado[['Produto', 'Modelo']].drop_duplicates()
-
-    produto_frequencia = produto_frequencia.merge(produto_info, on='Produto', how='left')
+    # Os 30 produtos mais pedidos no período, mais uma barra "Outros" com o
+    # restante, lidos do índice de frequência da carteira
+    produto_frequencia = filas_classificadas.produtos().ranking(data_inicial_filter, data_final_filter, k=30)
 
     fig_barras_produtos = px.bar(
     produto_frequencia, 
@@ -347,7 +267,7 @@ def guia_dashboard():
         paper_bgcolor="rgba(9, 70, 128, 0.39)",  # Fundo transparente para o gráfico
         plot_bgcolor="rgba(9, 70, 128, 0.39)",  
         xaxis=dict(
-            range=[0, 30],  
+            range=[-0.5, len(produto_frequencia) - 0.5],  
             fixedrange=False  
         )
     )
@@ -642,9 +562,6 @@ def calcular_pendentes_atrasados(df):
 
 def guia_separacao():
     st.title("Separação")
-    
-    perfil1_filtrado = separacao.copy()  
-    perfil1_filtrado = definir_data_e_status(perfil1_filtrado)
 
     col_filter1, col_filter2, col_filter3, col_date_filter1, col_date_filter2 = st.columns(5)
     
@@ -688,27 +605,10 @@ def guia_separacao():
     #if atrasados_sep_pedido > 0:
     #   st.sidebar.markdown(f'<div class="blinking-orange">URGENTE: Você precisa separar ou emitir OE de {atrasados_sep_pedido} produtos!</div>', unsafe_allow_html=True)
 
-    # Filtrar DataFrame para manter apenas as colunas desejadas
-    pf1_filtrado = perfil1_filtrado[colunas_desejadas]
-
-    # Função para gerar o Excel
-    def gerar_excel(df):
-    # Salva o DataFrame em um buffer de memória (BytesIO)
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Relatório')
-        buffer.seek(0)  # Volta o cursor para o início do buffer
-        return buffer
-
-    # Gerar o Excel assim que a página for carregada
-    excel_file = gerar_excel(pf1_filtrado)
-
-    # Botão para baixar o Excel
-    st.download_button(
-        label="Exportar Relatório",
-        data=excel_file,
-        file_name="separacao.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    exportar_excel(
+        lambda: perfil1_filtrado[colunas_desejadas],
+        filas_classificadas.chave('Separação', fantasia_filter, ped_cliente_filter, status_filter, data_inicial_filter, data_final_filter),
+        "separacao.xlsx",
     )
 
 if perfil_opcao == "Separação 💻":
@@ -716,9 +616,6 @@ if perfil_opcao == "Separação 💻":
 
 def guia_compras():
     st.title("Compras")
-    
-    compras_filtrado = compras.copy()  
-    compras_filtrado = definir_data_e_status(compras_filtrado)
 
     col_filter1, col_filter2, col_filter3, col_date_filter1, col_date_filter2 = st.columns(5)
     
@@ -757,27 +654,10 @@ def guia_compras():
     if atrasados_oee > 0:
         st.sidebar.markdown(f'<div class="blinking-red">Atenção: Você possui {atrasados_oee} produtos atrasados!</div>', unsafe_allow_html=True)
 
-    # Filtrar DataFrame para manter apenas as colunas desejadas
-    cp_filtrado = compras_filtrado[colunas_desejadas]
-
-    # Função para gerar o Excel
-    def gerar_excel(df):
-    # Salva o DataFrame em um buffer de memória (BytesIO)
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Relatório')
-        buffer.seek(0)  # Volta o cursor para o início do buffer
-        return buffer
-
-    # Gerar o Excel assim que a página for carregada
-    excel_file = gerar_excel(cp_filtrado)
-
-    # Botão para baixar o Excel
-    st.download_button(
-        label="Exportar Relatório",
-        data=excel_file,
-        file_name="itens_compras.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    exportar_excel(
+        lambda: compras_filtrado[colunas_desejadas],
+        filas_classificadas.chave('Compras', fantasia_filter, ped_cliente_filter, status_filter, data_inicial_filter, data_final_filter),
+        "itens_compras.xlsx",
     )
 
 if perfil_opcao == "Compras 🛒":
@@ -785,9 +665,6 @@ if perfil_opcao == "Compras 🛒":
 
 def guia_embalagem():
     st.title("Embalagem")
-    
-    embalagem_filtrado = embalagem.copy()  
-    embalagem_filtrado = definir_data_e_status(embalagem_filtrado)
 
     col_filter1, col_filter2, col_filter3, col_date_filter1, col_date_filter2 = st.columns(5)
     
@@ -830,27 +707,10 @@ def guia_embalagem():
     #if atrasados_emb_pedido > 0:
     #   st.sidebar.markdown(f'<div class="blinking-orange">URGENTE: Você precisa embalar {atrasados_emb_pedido} produtos! </div>', unsafe_allow_html=True)
 
-    # Filtrar DataFrame para manter apenas as colunas desejadas
-    emb_filtrado = embalagem_filtrado[colunas_desejadas]
-
-    # Função para gerar o Excel
-    def gerar_excel(df):
-    # Salva o DataFrame em um buffer de memória (BytesIO)
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Relatório')
-        buffer.seek(0)  # Volta o cursor para o início do buffer
-        return buffer
-
-    # Gerar o Excel assim que a página for carregada
-    excel_file = gerar_excel(emb_filtrado)
-
-    # Botão para baixar o Excel
-    st.download_button(
-        label="Exportar Relatório",
-        data=excel_file,
-        file_name="itens_embalagem.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    exportar_excel(
+        lambda: embalagem_filtrado[colunas_desejadas],
+        filas_classificadas.chave('Embalagem', fantasia_filter, ped_cliente_filter, status_filter, data_inicial_filter, data_final_filter),
+        "itens_embalagem.xlsx",
     )
 
 if perfil_opcao == "Embalagem 📦":
@@ -858,9 +718,6 @@ if perfil_opcao == "Embalagem 📦":
 
 def guia_expedicao():
     st.title("Expedição")
-    
-    expedicao_filtrado = expedicao.copy()  
-    expedicao_filtrado = definir_data_e_status(expedicao_filtrado) 
 
     col_filter1, col_filter2, col_filter3 = st.columns(3)
     
@@ -901,27 +758,10 @@ def guia_expedicao():
     if atrasados_exp > 0:
         st.sidebar.markdown(f'<div class="blinking-red">Atenção: Você possui {atrasados_exp} produtos atrasados!</div>', unsafe_allow_html=True)
 
-    # Filtrar DataFrame para manter apenas as colunas desejadas
-    exp_filtrado = expedicao_filtrado[colunas_desejadas]
-
-    # Função para gerar o Excel
-    def gerar_excel(df):
-    # Salva o DataFrame em um buffer de memória (BytesIO)
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Relatório')
-        buffer.seek(0)  # Volta o cursor para o início do buffer
-        return buffer
-
-    # Gerar o Excel assim que a página for carregada
-    excel_file = gerar_excel(exp_filtrado)
-
-    # Botão para baixar o Excel
-    st.download_button(
-        label="Exportar Relatório",
-        data=excel_file,
-        file_name="itens_expedicao.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    exportar_excel(
+        lambda: expedicao_filtrado[colunas_desejadas],
+        filas_classificadas.chave('Expedição', fantasia_filter, ped_cliente_filter, status_filter, data_inicial_filter, data_final_filter),
+        "itens_expedicao.xlsx",
     )
 
 if perfil_opcao == "Expedição 🚚":
@@ -0,0 +1,66 @@
+import math
+import numpy as np
+import pyarrow as pa
+import streamlit as st
+from cache import CacheLRU
+
+# Opção do "Ordenar por" que mantém a ordem original da fila
+SEM_ORDEM = "(sem ordenação)"
+
+LINHAS_POR_PAGINA = [50, 100, 250, 500]
+
+
+# Páginas já convertidas para Arrow e ordens de classificação, compartilhadas
+# por todas as sessões. As chaves incluem a combinação de filtros (que já traz
+# a versão da planilha e o dia), então nada fica valendo de uma versão para outra.
+@st.cache_resource
+def obter_cache_paginas():
+    return CacheLRU(max_entradas=256, max_bytes=64 * 2**20, medir=lambda valor: valor.nbytes)
+
+
+# Posições das linhas na ordem pedida; vazios ficam sempre no fim
+def _ordenar(frame, coluna, crescente):
+    if coluna == SEM_ORDEM:
+        return np.arange(len(frame))
+    ordem = frame[coluna].reset_index(drop=True).sort_values(
+        ascending=crescente, kind='stable', na_position='last'
+    ).index
+    return ordem.to_numpy()
+
+
+# Tabela paginada: a ordenação e a página ficam no servidor e só as linhas
+# visíveis são convertidas e enviadas ao navegador. 'chave' identifica o
+# conteúdo de 'frame' (ex.: resumo.chave de FilasClassificadas.consultar) e
+# 'nome' separa o estado dos controles de cada tela.
+def tabela_paginada(frame, chave, nome):
+    cache = obter_cache_paginas()
+    total = len(frame)
+
+    col_ordem, col_sentido, col_tamanho, col_pagina = st.columns([3, 2, 2, 2])
+    with col_ordem:
+        coluna = st.selectbox("Ordenar por", options=[SEM_ORDEM] + list(frame.columns), key=f"{nome}_ordem")
+    with col_sentido:
+        sentido = st.radio("Sentido", options=["Crescente", "Decrescente"], horizontal=True, key=f"{nome}_sentido")
+    with col_tamanho:
+        por_pagina = st.selectbox("Linhas por página", options=LINHAS_POR_PAGINA, index=1, key=f"{nome}_por_pagina")
+
+    paginas = max(1, math.ceil(total / por_pagina))
+    # Filtros ou ordenação diferentes voltam para a primeira página
+    estado = (chave, coluna, sentido, por_pagina)
+    if st.session_state.get(f"{nome}_estado") != estado:
+        st.session_state[f"{nome}_estado"] = estado
+        st.session_state[f"{nome}_pagina"] = 1
+    with col_pagina:
+        pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key=f"{nome}_pagina")
+
+    crescente = sentido == "Crescente"
+    ordem = cache.obter(('ordem', chave, coluna, crescente), lambda: _ordenar(frame, coluna, crescente))
+    inicio = (pagina - 1) * por_pagina
+    fim = min(inicio + por_pagina, total)
+    tabela = cache.obter(
+        ('pagina', chave, coluna, crescente, por_pagina, pagina),
+        lambda: pa.Table.from_pandas(frame.take(ordem[inicio:fim]), preserve_index=True),
+    )
+
+    st.dataframe(tabela)
+    st.caption(f"Linhas {inicio + 1 if total else 0}–{fim} de {total}")